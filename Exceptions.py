@@ -1,9 +1,13 @@
 class DuplicateNameException(Exception):
+    __slots__ = ('name',)
+
     def __init__(self, name: str):
         self.name = name
         super().__init__(f"Name already exists in rendering window: {name}")
 
 
 class NullMeshObjectException(Exception):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__("There was no mesh file foudn")
@@ -44,6 +44,11 @@ class HeadlessNode:
 
 
 class VisualNode(gui.Vert, HeadlessNode):
+    # Visual nodes step on the GUI thread by default. Subclasses whose step()
+    # never touches gui/rendering state can set this False to run step()
+    # directly on the computational thread and skip the cross-thread post
+    step_on_main_thread = True
+
     def __init__(self, register_with_panel=True):
         gui.Vert.__init__(self)
         HeadlessNode.__init__(self)
@@ -1,23 +1,31 @@
-import open3d
+import importlib
 import sys
 
 cuda = "cuda" in sys.argv
 
+__all__ = ('rendering', 'gui', 'geometry', 'device')
 
-if open3d.__DEVICE_API__ == 'cuda':
-    import open3d.cuda.pybind.visualization.rendering as rendering
-    import open3d.cuda.pybind.visualization.gui as gui
-    import open3d.cuda.pybind.t.geometry as geometry
 
-    if cuda:
-        device = open3d.core.Device("CUDA:0")
-        print("Using Cuda")
-    else:
-        device = open3d.core.Device("CPU:0")
+def __getattr__(name):
+    # Lazily import the heavy pybind submodules on first reference so that
+    # code which only needs e.g. gui does not pay for rendering/geometry,
+    # and headless processes importing the package pay for none of them
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import open3d
+    prefix = "open3d.cuda.pybind" if open3d.__DEVICE_API__ == 'cuda' else "open3d.cpu.pybind"
 
+    if name == "device":
+        if open3d.__DEVICE_API__ == 'cuda' and cuda:
+            value = open3d.core.Device("CUDA:0")
+            print("Using Cuda")
+        else:
+            value = open3d.core.Device("CPU:0")
+    elif name == "geometry":
+        value = importlib.import_module(prefix + ".t.geometry")
+    else:
+        value = importlib.import_module(prefix + ".visualization." + name)
 
-else:
-    import open3d.cpu.pybind.visualization.rendering as rendering
-    import open3d.cpu.pybind.visualization.gui as gui
-    import open3d.cpu.pybind.t.geometry as geometry
-    device = open3d.core.Device("CPU:0")
+    globals()[name] = value
+    return value
@@ -1,23 +1,44 @@
 import open3d.visualization.gui as gui
+import atexit
+import functools
+import logging
 import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Accumulated nanoseconds and call counts per decorated function, dumped once at exit
+_STATS = defaultdict(lambda: [0, 0])
 
 
 def Open3DErrorProtect(func):
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         try:
-            func(*args, **kwargs)
-        except Exception as e:
-            print(str(e))
+            return func(*args, **kwargs)
+        except Exception:
+            logger.exception("Open3D callback failed")
             gui.Application.instance.quit()
 
     return wrapper
 
 
 def timeit(func):
+    stats = _STATS[func.__qualname__]
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        now = time.time()
+        t0 = time.perf_counter_ns()
         result = func(*args, **kwargs)
-        print(time.time() - now)
+        stats[0] += time.perf_counter_ns() - t0
+        stats[1] += 1
         return result
 
     return wrapper
+
+
+@atexit.register
+def _dump_timeit_stats():
+    for name, (total_ns, calls) in sorted(_STATS.items()):
+        if calls:
+            print(f"{name}: {calls} calls, {total_ns / 1e6:.3f} ms total, {total_ns / calls / 1e6:.3f} ms avg")